@@ -19,7 +19,7 @@ import struct
 import hashlib
 import string
 from   ctypes import *
-from   functools import reduce
+from   functools import reduce, lru_cache
 from   importlib.machinery import SourceFileLoader
 from   SingleSign import *
 
@@ -171,10 +171,23 @@ def get_padding_length (data_len, alignment = 4):
     return new_data_len - data_len
 
 def get_file_data (file, mode = 'rb'):
-    return open(file, mode).read()
+    # read() sizes its buffer from fstat and fills it in one go, so there is
+    # nothing to gain from reading into a preallocated buffer here
+    with open (file, mode) as fd:
+        return fd.read()
+
+def get_file_bytearray (file):
+    # read a file straight into a writable buffer, skipping the bytes copy
+    # that bytearray(get_file_data(file)) would make
+    with open (file, 'rb') as fd:
+        data = bytearray (os.fstat (fd.fileno()).st_size)
+        fd.readinto (data)
+    return data
 
 def gen_file_from_object (file, object):
-    open (file, 'wb').write(object)
+    # buffer objects are written as is, without a copy to bytes
+    with open (file, 'wb') as fo:
+        fo.write (object)
 
 def gen_file_with_size (file, size):
     open (file, 'wb').write(b'\xFF' * size);
@@ -250,13 +263,13 @@ def adjust_hash_type (pub_key_file):
 
     return hash_type
 
-def rsa_sign_file (priv_key, pub_key, hash_type, sign_scheme, in_file, out_file, inc_dat = False, inc_key = False):
+def rsa_sign_file (priv_key, pub_key, hash_type, sign_scheme, in_file, out_file, inc_dat = False, inc_key = False, digest = None):
 
     bins = bytearray()
     if inc_dat:
         bins.extend(get_file_data(in_file))
 
-    single_sign_file(priv_key, hash_type, sign_scheme, in_file, out_file)
+    single_sign_file(priv_key, hash_type, sign_scheme, in_file, out_file, digest)
 
     out_data = get_file_data(out_file)
 
@@ -365,9 +378,7 @@ def decompress (in_file, out_file, tool_dir = ''):
         except:
             print("Could not find/use CompressLz4 tool, trying with python lz4...")
             try:
-                import lz4.block
-                if lz4.VERSION != '3.1.1':
-                    print("Recommended lz4 module version is '3.1.1', '%s' is currently installed." % lz4.VERSION)
+                lz4 = import_lz4 ()
             except ImportError:
                 print("Could not import lz4, use 'python -m pip install lz4==3.1.1' to install it.")
                 exit(1)
@@ -383,7 +394,7 @@ def decompress (in_file, out_file, tool_dir = ''):
         run_process (cmdline, False, True)
     os.remove(temp)
 
-def compress (in_file, alg, svn=0, out_path = '', tool_dir = ''):
+def compress (in_file, alg, svn=0, out_path = '', tool_dir = '', level = None):
     if not os.path.isfile(in_file):
         raise Exception ("Invalid input file '%s' !" % in_file)
 
@@ -414,24 +425,26 @@ def compress (in_file, alg, svn=0, out_path = '', tool_dir = ''):
             shutil.copy(in_file, out_file)
             compress_data = get_file_data(out_file)
         elif sig == "LZ4 ":
-            try:
-                cmdline = [
-                    os.path.join (tool_dir, compress_tool),
-                    "-e",
-                    "-o", out_file,
-                    in_file]
-                run_process (cmdline, False, True)
-                compress_data = get_file_data(out_file)
-            except:
-                print("Could not find/use CompressLz4 tool, trying with python lz4...")
+            compress_data = None
+            # the compression tool has no level option, use python lz4 for an explicit level
+            if level is None:
+                try:
+                    cmdline = [
+                        os.path.join (tool_dir, compress_tool),
+                        "-e",
+                        "-o", out_file,
+                        in_file]
+                    run_process (cmdline, False, True)
+                    compress_data = get_file_data(out_file)
+                except:
+                    print("Could not find/use CompressLz4 tool, trying with python lz4...")
+            if compress_data is None:
                 try:
-                    import lz4.block
-                    if lz4.VERSION != '3.1.1':
-                        print("Recommended lz4 module version is '3.1.1', '%s' is currently installed." % lz4.VERSION)
+                    import_lz4 ()
                 except ImportError:
                     print("Could not import lz4, use 'python -m pip install lz4==3.1.1' to install it.")
                     exit(1)
-                compress_data = lz4.block.compress(get_file_data(in_file), mode='high_compression')
+                compress_data = lz4_compress (get_file_data(in_file), level)
         elif sig == "LZMA":
             cmdline = [
                 os.path.join (tool_dir, compress_tool),
@@ -443,14 +456,54 @@ def compress (in_file, alg, svn=0, out_path = '', tool_dir = ''):
     else:
         compress_data = bytearray()
 
+    data = gen_lz_data (sig, svn, os.path.getsize(in_file), compress_data)
+    gen_file_from_object (out_file, data)
+
+    return out_file
+
+def gen_lz_data (sig, svn, length, compress_data):
+    # prepend the LZ header to the compressed data
     lz_hdr = LZ_HEADER ()
     lz_hdr.signature = sig.encode()
     lz_hdr.svn = svn
     lz_hdr.compressed_len = len(compress_data)
-    lz_hdr.length = os.path.getsize(in_file)
-    data = bytearray ()
-    data.extend (lz_hdr)
+    lz_hdr.length = length
+    data = bytearray (lz_hdr)
     data.extend (compress_data)
-    gen_file_from_object (out_file, data)
+    return data
+
+@lru_cache (maxsize = None)
+def import_lz4 ():
+    # import python lz4 for all its users, the version warning is only printed
+    # once, it raises ImportError if the module is missing
+    import lz4.block
+    if lz4.VERSION != '3.1.1':
+        print("Recommended lz4 module version is '3.1.1', '%s' is currently installed." % lz4.VERSION)
+    return lz4
+
+def lz4_compress (in_data, level = None):
+    # LZ4 HC, 'level' ranges from 1 to 12 and defaults to 9. Higher levels
+    # give a smaller image at a slower compression, decompression speed is
+    # the same for all levels
+    lz4 = import_lz4 ()
+    if level is None:
+        return lz4.block.compress(in_data, mode='high_compression')
+    return lz4.block.compress(in_data, mode='high_compression', compression=level)
+
+def compress_buffer (in_data, alg, svn=0, level=None):
+    # compress a buffer in process, it raises ImportError if the python
+    # module for the algorithm is missing so that callers can fall back to
+    # compress() with the external tools
+    if alg == "Dummy":
+        sig = "LZDM"
+        compress_data = in_data
+    elif alg == "Lz4":
+        sig = "LZ4 "
+        if len(in_data) > 0:
+            compress_data = lz4_compress (in_data, level)
+        else:
+            compress_data = bytearray()
+    else:
+        raise Exception ("Unsupported in-process compression '%s' !" % alg)
 
-    return out_file
+    return gen_lz_data (sig, svn, len(in_data), compress_data)
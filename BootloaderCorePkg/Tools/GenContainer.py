@@ -8,6 +8,7 @@
 ##
 import sys
 import argparse
+import mmap
 import re
 sys.dont_write_bytecode = True
 from   ctypes import *
@@ -32,17 +33,17 @@ class COMPONENT_ENTRY (Structure):
         'RESERVED' : 0x80
     }
 
-    def __new__(cls, buf = None):
+    def __new__(cls, buf = None, offset = 0):
         if buf is None:
             return Structure.__new__(cls)
         else:
-            return cls.from_buffer_copy(buf)
+            return cls.from_buffer_copy(buf, offset)
 
-    def __init__(self, buf = None):
+    def __init__(self, buf = None, offset = 0):
         if buf is None:
             self.hash_data = bytearray()
         else:
-            off = sizeof(COMPONENT_ENTRY)
+            off = offset + sizeof(COMPONENT_ENTRY)
             self.hash_data = bytearray(buf[off : off + self.hash_size])
         self.data      = bytearray()
         self.auth_data = bytearray()
@@ -73,38 +74,51 @@ class CONTAINER_HDR (Structure):
       'MULTIBOOT'  :  0xF4,                 # Multiboot compliant ELF images
     }
 
-    def __new__(cls, buf = None):
+    def __new__(cls, buf = None, copy_data = True):
         if buf is None:
             return Structure.__new__(cls)
         else:
             return cls.from_buffer_copy(buf)
 
-    def __init__(self, buf = None):
+    def __init__(self, buf = None, copy_data = True):
         self.priv_key   = ''
         self.alignment  = 0x1000
         self.auth_data  = bytearray()
         self.comp_entry = []
 
         if buf is not None:
-            # construct CONTAINER_HDR from existing buffer
+            # construct CONTAINER_HDR from existing buffer, buf is expected to be
+            # a memoryview so that slicing it does not copy the image data, the
+            # component data are left as views into buf if copy_data is False
             offset = sizeof(self)
             alignment = None
-            for i in range(self.entry_count):
-                component = COMPONENT_ENTRY(buf[offset:])
-                if alignment is None:
-                    alignment = 1 << component.alignment
-                offset += (sizeof(component) + component.hash_size)
-                comp_offset = component.offset + self.data_offset
-                lz_hdr = LZ_HEADER.from_buffer(bytearray(buf[comp_offset:comp_offset + sizeof(LZ_HEADER)]))
-                auth_offset = comp_offset + lz_hdr.compressed_len + sizeof(lz_hdr)
-                component.data = bytearray (buf[comp_offset:auth_offset])
-                auth_offset = get_aligned_value (auth_offset, 4)
-                auth_size = CONTAINER.get_auth_size (component.auth_type, True)
-                component.auth_data = bytearray (buf[auth_offset:auth_offset + auth_size])
-                self.comp_entry.append (component)
-            auth_size   = CONTAINER.get_auth_size (self.auth_type, True)
-            auth_offset = get_aligned_value (offset, 4)
-            self.auth_data = bytearray (buf[auth_offset:auth_offset + auth_size])
+            views = []
+            try:
+                for i in range(self.entry_count):
+                    component = COMPONENT_ENTRY(buf, offset)
+                    if alignment is None:
+                        alignment = 1 << component.alignment
+                    offset += (sizeof(component) + component.hash_size)
+                    comp_offset = component.offset + self.data_offset
+                    lz_hdr = LZ_HEADER.from_buffer_copy(buf, comp_offset)
+                    auth_offset = comp_offset + lz_hdr.compressed_len + sizeof(lz_hdr)
+                    if copy_data:
+                        component.data = bytearray (buf[comp_offset:auth_offset])
+                    else:
+                        component.data = buf[comp_offset:auth_offset]
+                        views.append (component.data)
+                    auth_offset = (auth_offset + 3) & ~3
+                    auth_size = CONTAINER.get_auth_size (component.auth_type, True)
+                    component.auth_data = bytearray (buf[auth_offset:auth_offset + auth_size])
+                    self.comp_entry.append (component)
+                auth_size   = CONTAINER.get_auth_size (self.auth_type, True)
+                auth_offset = (offset + 3) & ~3
+                self.auth_data = bytearray (buf[auth_offset:auth_offset + auth_size])
+            except:
+                # the views taken so far would keep the underlying buffer from being closed
+                for view in views:
+                    view.release ()
+                raise
             if alignment is not None:
                 self.alignment = alignment
 
@@ -120,6 +134,8 @@ class CONTAINER ():
             "RSA3072_PSS_SHA2_384"       : 6,
         }
 
+    _auth_type_str = dict(map(reversed, _auth_type_value.items()))
+
     _auth_to_hashalg_str = {
         "NONE"                       : "NONE",
         "SHA2_256"                   : "SHA2_256",
@@ -141,17 +157,40 @@ class CONTAINER ():
         "RSA3072_PSS_SHA2_384"       : "RSA_PSS",
         }
 
-    def __init__(self, buf = None):
+    # command line compression choice to compression algorithm
+    _compress_alg_str = {
+        "lz4"                        : "Lz4",
+        "lzma"                       : "Lzma",
+        "dummy"                      : "Dummy",
+        }
+
+    def __init__(self, buf = None, copy_data = True):
         self.out_dir   = '.'
         self.input_dir = '.'
         self.key_dir   = '.'
         self.tool_dir  = '.'
+        self.comp_level = None
+        self.cache_dir = ''
         if buf is None:
             self.header = CONTAINER_HDR ()
         else:
-            self.header = CONTAINER_HDR (buf)
+            # without copy_data, the component data keep referring to buf
+            # after mv is released, see release_data ()
+            with memoryview (buf) as mv:
+                self.header = CONTAINER_HDR (mv, copy_data)
             # Check if image type is valid
-            image_type_str = CONTAINER.get_image_type_str(self.header.image_type)
+            try:
+                CONTAINER.get_image_type_str(self.header.image_type)
+            except:
+                self.release_data ()
+                raise
+        self._comp_by_name = dict((comp.name.decode(), comp) for comp in self.header.comp_entry)
+
+    def release_data (self):
+        # release the component data views taken by CONTAINER (buf, False)
+        for component in self.header.comp_entry:
+            if isinstance (component.data, memoryview):
+                component.data.release ()
 
     def init_header (self, signature, alignment, image_type = 'NORMAL'):
         self.header.signature  = signature
@@ -177,8 +216,8 @@ class CONTAINER ():
     @staticmethod
     def get_auth_type_str (auth_type_val):
         try:
-            auth_type_str = next(k for k, v in CONTAINER._auth_type_value.items() if v == auth_type_val)
-        except StopIteration:
+            auth_type_str = CONTAINER._auth_type_str[auth_type_val]
+        except KeyError:
             raise Exception ("Unknown auth type value 0x%x !" % auth_type_val)
         return auth_type_str
 
@@ -208,7 +247,7 @@ class CONTAINER ():
         # decode auth type into readable string
         extra = ''
         if name in ['CONTAINER_HDR.auth_type', 'COMPONENT_ENTRY.auth_type']:
-            auth_type = next(k for k, v in CONTAINER._auth_type_value.items() if v == val)
+            auth_type = CONTAINER.get_auth_type_str (val)
             extra = '%d : %s' % (val, auth_type)
         return extra
 
@@ -232,53 +271,64 @@ class CONTAINER ():
     @staticmethod
     def output_struct (obj, indent = 0, plen = 0):
         # print out a struct info
-        body = '' if indent else (' ' * indent + '<%s>:\n') % obj.__class__.__name__
+        name = obj.__class__.__name__
+        body = [] if indent else [(' ' * indent + '<%s>:\n') % name]
         if plen == 0:
             plen = sizeof(obj)
         pstr = ('  ' * (indent + 1) + '{0:<%d} = {1}\n') % CONTAINER._struct_display_indent
-        for field in obj._fields_:
-            key = field[0]
+        for key, ctype in obj._fields_:
             val = getattr(obj, key)
             rep = ''
             if type(val) is str:
                 rep = "0x%X ('%s')" % (bytes_to_value(bytearray(val)), val)
             elif type(val) in [int]:
-                rep = CONTAINER.decode_field ('%s.%s' % (obj.__class__.__name__, key), val)
+                rep = CONTAINER.decode_field ('%s.%s' % (name, key), val)
                 if not rep:
                     rep = '0x%X' % (val)
             else:
                 rep = str(val)
-            plen -= sizeof(field[1])
-            body += pstr.format(key, rep)
+            plen -= sizeof(ctype)
+            body.append (pstr.format(key, rep))
             if plen <= 0:
                 break
-        return body.strip()
+        return ''.join(body).strip()
 
     @staticmethod
-    def get_pub_key_hash (key, hash_type):
-        # calculate publish key hash
-        dh = bytearray (key)[sizeof(PUB_KEY_HDR):]
+    def get_hash (data, hash_type):
+        # calculate the digest of a buffer
         if hash_type == 'SHA2_256':
-            return bytearray(hashlib.sha256(dh).digest())
+            return hashlib.sha256(data).digest()
         elif hash_type == 'SHA2_384':
-            return bytearray(hashlib.sha384(dh).digest())
+            return hashlib.sha384(data).digest()
         else:
-            raise Exception ("Unsupported hash type in get_pub_key_hash!")
+            raise Exception ("Unsupported hash type '%s' !" % hash_type)
 
     @staticmethod
-    def calculate_auth_data (file, auth_type, priv_key, out_dir):
+    def get_pub_key_hash (key, hash_type):
+        # calculate publish key hash
+        dh = memoryview (key)[sizeof(PUB_KEY_HDR):]
+        return bytearray(CONTAINER.get_hash (dh, hash_type))
+
+    @staticmethod
+    def calculate_auth_data (file, auth_type, priv_key, out_dir, data = None):
         # calculate auth info for a given file
+        # if the file content is already in memory, pass it in data to skip reading the file again,
+        # the file then does not have to exist, its name is only used for the .pub/.sig files
         hash_data = bytearray()
         auth_data = bytearray()
         basename = os.path.basename (file)
         if auth_type in ['NONE']:
             pass
         elif auth_type in ["SHA2_256"]:
-            data = get_file_data (file)
-            hash_data.extend (hashlib.sha256(data).digest())
+            if data is None:
+                hash_data.extend (get_file_digest (file, 'sha256'))
+            else:
+                hash_data.extend (CONTAINER.get_hash (data, auth_type))
         elif auth_type in ["SHA2_384"]:
-            data = get_file_data (file)
-            hash_data.extend (hashlib.sha384(data).digest())
+            if data is None:
+                hash_data.extend (get_file_digest (file, 'sha384'))
+            else:
+                hash_data.extend (CONTAINER.get_hash (data, auth_type))
         elif auth_type in ['RSA2048_PKCS1_SHA2_256', 'RSA3072_PKCS1_SHA2_384', 'RSA2048_PSS_SHA2_256', 'RSA3072_PSS_SHA2_384' ]:
             auth_type = adjust_auth_type (auth_type, priv_key)
             pub_key = os.path.join(out_dir, basename + '.pub')
@@ -286,7 +336,9 @@ class CONTAINER ():
             key_hash = CONTAINER.get_pub_key_hash (di, CONTAINER._auth_to_hashalg_str[auth_type])
             hash_data.extend (key_hash)
             out_file = os.path.join(out_dir, basename + '.sig')
-            rsa_sign_file (priv_key, pub_key, CONTAINER._auth_to_hashalg_str[auth_type], CONTAINER._auth_to_signscheme_str[auth_type], file, out_file, False, True)
+            hash_type = CONTAINER._auth_to_hashalg_str[auth_type]
+            digest = None if data is None else CONTAINER.get_hash (data, hash_type)
+            rsa_sign_file (priv_key, pub_key, hash_type, CONTAINER._auth_to_signscheme_str[auth_type], file, out_file, False, True, digest)
             auth_data.extend (get_file_data(out_file))
         else:
             raise Exception ("Unsupport AuthType '%s' !" % auth_type)
@@ -318,42 +370,51 @@ class CONTAINER ():
             self.header.auth_data = b'\xff' * auth_size
 
     def get_header_size (self):
-        length = sizeof (self.header)
-        for comp in self.header.comp_entry:
-            length += comp.hash_size
-        length += sizeof(COMPONENT_ENTRY) * len(self.header.comp_entry)
+        comp_entry = self.header.comp_entry
+        length  = sizeof (self.header) + sizeof(COMPONENT_ENTRY) * len(comp_entry)
+        length += sum (comp.hash_size for comp in comp_entry)
         length += len(self.header.auth_data)
         return length
 
     def get_auth_data (self, comp_file, auth_type_str):
         # calculate auth info for a give component file with specified auth type
         auth_size = CONTAINER.get_auth_size (auth_type_str, True)
-        file_data = bytearray(get_file_data (comp_file))
+        file_data = get_file_data (comp_file)
         auth_data = None
         hash_data = bytearray()
 
         if len(file_data) < sizeof (LZ_HEADER):
             return file_data, hash_data, auth_data
 
-        lz_header = LZ_HEADER.from_buffer(file_data)
+        lz_header = LZ_HEADER.from_buffer_copy(file_data)
         data      = bytearray()
         if lz_header.signature in LZ_HEADER._compress_alg:
             offset = sizeof(lz_header) + get_aligned_value (lz_header.compressed_len)
             if len(file_data) == auth_size + offset:
                 auth_data = file_data[offset:offset+auth_size]
                 data = file_data[:sizeof(lz_header) + lz_header.compressed_len]
-                if auth_type_str in ["SHA2_256"]:
-                    hash_data.extend (hashlib.sha256(data).digest())
-                if auth_type_str in ["SHA2_384"]:
-                    hash_data.extend (hashlib.sha384(data).digest())
-                elif auth_type_str in ['RSA2048', 'RSA3072']:
-                    offset += ((CONTAINER.get_auth_size (auth_type_str)))
-                    key_hash = self.get_pub_key_hash (file_data[offset:])
+                if auth_type_str in ['NONE']:
+                    pass
+                elif auth_type_str in ["SHA2_256", "SHA2_384"]:
+                    hash_data.extend (CONTAINER.get_hash (data, auth_type_str))
+                elif auth_type_str.startswith ('RSA'):
+                    # auth data holds the signature header, the signature and then the public key
+                    offset += sizeof(SIGNATURE_HDR) + CONTAINER.get_auth_size (auth_type_str)
+                    key_hash = CONTAINER.get_pub_key_hash (file_data[offset:], CONTAINER._auth_to_hashalg_str[auth_type_str])
                     hash_data.extend (key_hash)
                 else:
-                    raise Exception ("Unsupport AuthType '%s' !" % auth_type)
+                    raise Exception ("Unsupport AuthType '%s' !" % auth_type_str)
         return data, hash_data, auth_data
 
+    def get_header_data (self):
+        # serialize the container header and component entries along with their hash data
+        header   = self.header
+        hdr_data = [bytes(header)]
+        for component in header.comp_entry:
+            hdr_data.append (bytes(component))
+            hdr_data.append (component.hash_data)
+        return b''.join (hdr_data)
+
     def adjust_header (self):
         # finalize the container
         header = self.header
@@ -368,12 +429,7 @@ class CONTAINER ():
         auth_type = self.get_auth_type_str (header.auth_type)
         basename = header.signature.decode()
         hdr_file = os.path.join(self.out_dir, basename + '.hdr')
-        hdr_data = bytearray (header)
-        for component in header.comp_entry:
-            hdr_data.extend (component)
-            hdr_data.extend (component.hash_data)
-        gen_file_from_object (hdr_file, hdr_data)
-        hash_data, auth_data = CONTAINER.calculate_auth_data (hdr_file, auth_type, header.priv_key, self.out_dir)
+        hash_data, auth_data = CONTAINER.calculate_auth_data (hdr_file, auth_type, header.priv_key, self.out_dir, self.get_header_data ())
         if len(auth_data) != len(header.auth_data):
             print (len(auth_data) , len(header.auth_data))
             raise Exception ("Unexpected authentication data length for container header !")
@@ -381,42 +437,61 @@ class CONTAINER ():
 
     def get_data (self):
         # Prepare data buffer
+        # Allocate the whole image once and fill each part in place
         header = self.header
-        data = bytearray(header)
-        for component in header.comp_entry:
-            data.extend (component)
-            data.extend (component.hash_data)
-        padding = b'\xff' *  get_padding_length (len(data))
-        data.extend(padding + header.auth_data)
-        for component in header.comp_entry:
-            offset = component.offset + header.data_offset
-            data.extend (b'\xff' * (offset - len(data)))
-            comp_data = bytearray(component.data)
-            padding = b'\xff' * get_padding_length (len(comp_data))
-            comp_data.extend (padding + component.auth_data)
-            if len(comp_data) > component.size:
-                raise Exception ("Component '%s' needs space 0x%X, but region size is 0x%X !" % (component.name.decode(), len(comp_data), component.size))
-            data.extend (comp_data)
-        offset = header.data_offset + header.data_size
-        data.extend (b'\xff' * (offset - len(data)))
+        length = header.data_offset + header.data_size
+        data   = bytearray (b'\xff') * length
+        with memoryview (data) as mv:
+            hdr_data = self.get_header_data ()
+            offset = len(hdr_data)
+            mv[:offset] = hdr_data
+            offset = (offset + 3) & ~3
+            end    = offset + len(header.auth_data)
+            if end > header.data_offset:
+                raise Exception ("Container header needs space 0x%X, but header size is 0x%X !" % (end, header.data_offset))
+            mv[offset:end] = header.auth_data
+            for component in header.comp_entry:
+                comp_len = len(component.data)
+                auth_offset = (comp_len + 3) & ~3
+                needed = auth_offset + len(component.auth_data)
+                if needed > component.size:
+                    raise Exception ("Component '%s' needs space 0x%X, but region size is 0x%X !" % (component.name.decode(), needed, component.size))
+                offset = component.offset + header.data_offset
+                if offset + needed > length:
+                    raise Exception ("Component '%s' exceeds the container data region !" % component.name.decode())
+                mv[offset:offset + comp_len] = component.data
+                mv[offset + auth_offset:offset + needed] = component.auth_data
         return data
 
     def locate_component (self, comp_name):
-        component = None
-        for each in self.header.comp_entry:
-            if each.name.decode() == comp_name.upper():
-                component = each
-                break;
-        return component
+        return self._comp_by_name.get (comp_name.upper())
 
     def dump (self):
-        print ('%s' % self.output_struct (self.header))
-        print (self.hex_str (self.header.auth_data, 'auth_data'))
+        # collect the whole report and write it out at once
+        lines = [self.output_struct (self.header)]
+        lines.append (self.hex_str (self.header.auth_data, 'auth_data'))
         for component in self.header.comp_entry:
-            print ('%s' % self.output_struct (component))
-            print (self.hex_str (component.hash_data, 'hash_data'))
-            print (self.hex_str (component.auth_data, 'auth_data'))
-            print (self.hex_str (component.data, 'data') + ' %s' % str(component.data[:4].decode()))
+            lines.append (self.output_struct (component))
+            lines.append (self.hex_str (component.hash_data, 'hash_data'))
+            lines.append (self.hex_str (component.auth_data, 'auth_data'))
+            lines.append (self.hex_str (component.data, 'data') + ' %s' % bytes(component.data[:4]).decode())
+        lines.append ('')
+        sys.stdout.write ('\n'.join(lines))
+
+    def build_components (self, jobs):
+        for component, in_file, compress_alg, auth_type, key_file, svn in jobs:
+            # compress the component, Dummy needs no tool so build its data directly
+            if compress_alg == 'Dummy':
+                lz_file = os.path.join(self.out_dir, os.path.splitext(os.path.basename (in_file))[0] + '.lz')
+                component.data = compress_buffer (get_file_data (in_file), compress_alg, svn)
+            else:
+                level = self.comp_level if compress_alg == 'Lz4' else None
+                lz_file = compress (in_file, compress_alg, svn, self.out_dir, self.tool_dir, level)
+                component.data = get_file_bytearray (lz_file)
+
+            # calculate the component auth info
+            component.hash_data, component.auth_data = CONTAINER.calculate_auth_data (lz_file, auth_type, key_file, self.out_dir, component.data)
+            component.hash_size = len(component.hash_data)
 
     def create (self, layout):
 
@@ -448,6 +523,7 @@ class CONTAINER ():
         self.set_header_svn_info (svn)
 
         name_set = set()
+        comp_jobs = {}
         is_last_entry = False
         for name, file, compress_alg, auth_type, key_file, alignment, region_size, svn in layout[1:]:
             if is_last_entry:
@@ -485,24 +561,35 @@ class CONTAINER ():
                     compress_alg        = 'Dummy'
                     is_last_entry       = True
 
-            # compress the component
-            lz_file = compress (in_file, compress_alg, svn, self.out_dir, self.tool_dir)
-            component.data = bytearray(get_file_data (lz_file))
+            component.size = region_size
+            name_set.add (component.name)
+            self.header.comp_entry.append (component)
+            self._comp_by_name[name] = component
+
+            # components whose input files share a base name also share the
+            # intermediate .lz/.sig files, so they have to be built in turn,
+            # compare them the way the file system does (case-insensitive on Windows)
+            basename = os.path.normcase (os.path.splitext(os.path.basename (in_file))[0])
+            comp_jobs.setdefault (basename, []).append ((component, in_file, compress_alg, auth_type, key_file, svn))
+
+        # compress, hash and sign the components concurrently, the time is spent
+        # in external tools and in hashlib, which both run outside of the GIL
+        from concurrent.futures import ThreadPoolExecutor
+        workers = max (1, min (len(comp_jobs), os.cpu_count() or 1))
+        with ThreadPoolExecutor (max_workers = workers) as executor:
+            for future in [executor.submit (self.build_components, jobs) for jobs in comp_jobs.values()]:
+                future.result ()
 
-            # calculate the component auth info
-            component.hash_data, component.auth_data = CONTAINER.calculate_auth_data (lz_file, auth_type, key_file, self.out_dir)
-            component.hash_size = len(component.hash_data)
-            if region_size == 0:
+        for component in self.header.comp_entry:
+            if component.size == 0:
                 # arrange the region size automatically
                 region_size = len(component.data)
-                region_size = get_aligned_value (region_size, 4) + len(component.auth_data)
+                region_size = ((region_size + 3) & ~3) + len(component.auth_data)
                 if  is_mono_signing:
                     region_size = get_aligned_value (region_size, self.header.alignment)
                 else:
                     region_size = get_aligned_value (region_size, (1 << component.alignment))
-            component.size = region_size
-            name_set.add (component.name)
-            self.header.comp_entry.append (component)
+                component.size = region_size
 
         if len(name_set) != len(self.header.comp_entry):
             raise Exception ("Found duplicated component names in a container !")
@@ -510,11 +597,12 @@ class CONTAINER ():
         # calculate the component offset based on alignment requirement
         base_offset = None
         offset = self.get_header_size ()
+        lz_hdr_size = sizeof(LZ_HEADER)
         for component in self.header.comp_entry:
             alignment = (1 << component.alignment) - 1
             next_offset  = (offset + alignment) & ~alignment
-            if is_mono_signing and  (next_offset - offset >=  sizeof(LZ_HEADER)):
-                offset = next_offset - sizeof(LZ_HEADER)
+            if is_mono_signing and  (next_offset - offset >=  lz_hdr_size):
+                offset = next_offset - lz_hdr_size
             else:
                 offset = next_offset
             if base_offset is None:
@@ -531,8 +619,7 @@ class CONTAINER ():
             data = self.get_data ()[self.header.data_offset:]
             pods_comp = self.header.comp_entry[-1]
             pods_data = data[:pods_comp.offset]
-            gen_file_from_object (in_file, pods_data)
-            pods_comp.hash_data, pods_comp.auth_data = CONTAINER.calculate_auth_data (in_file, auth_type, key_file, self.out_dir)
+            pods_comp.hash_data, pods_comp.auth_data = CONTAINER.calculate_auth_data (in_file, auth_type, key_file, self.out_dir, pods_data)
 
         self.adjust_header ()
         data = self.get_data ()
@@ -551,24 +638,36 @@ class CONTAINER ():
             raise Exception ("Counld not locate component '%s' in container !" % comp_name)
         if comp_alg == '':
             # reuse the original compression alg
-            lz_header = LZ_HEADER.from_buffer(component.data)
+            lz_header = LZ_HEADER.from_buffer_copy(component.data)
             comp_alg  = LZ_HEADER._compress_alg[lz_header.signature]
         else:
-            comp_alg = comp_alg[0].upper() + comp_alg[1:]
+            comp_alg = CONTAINER._compress_alg_str[comp_alg]
 
         # verify the new component hash does match the hash stored in the container header
         auth_type_str = self.get_auth_type_str (component.auth_type)
         data, hash_data, auth_data = self.get_auth_data (comp_file, auth_type_str)
         if auth_data is None:
-            lz_file = compress (comp_file, comp_alg, svn, self.out_dir, self.tool_dir)
+            level = self.comp_level if comp_alg == 'Lz4' else None
             if auth_type_str.startswith ('RSA') and key_file == '':
                 raise Exception ("Signing key needs to be specified !")
-            hash_data, auth_data = CONTAINER.calculate_auth_data (lz_file, auth_type_str, key_file, self.out_dir)
-            data = get_file_data (lz_file)
+            cache_key = None
+            if self.cache_dir:
+                # compress () only skips the tools for an explicit level
+                compressor = 'python' if level is not None else 'tool:%s' % os.path.abspath (self.tool_dir)
+                cache_key = get_cache_key (comp_file, comp_alg, level, svn, auth_type_str, key_file, compressor)
+                cached = cache_lookup (self.cache_dir, cache_key)
+                if cached:
+                    data, hash_data, auth_data = cached
+            if auth_data is None:
+                lz_file = compress (comp_file, comp_alg, svn, self.out_dir, self.tool_dir, level)
+                data = get_file_data (lz_file)
+                hash_data, auth_data = CONTAINER.calculate_auth_data (lz_file, auth_type_str, key_file, self.out_dir, data)
+                if cache_key:
+                    cache_store (self.cache_dir, cache_key, data, hash_data, auth_data)
+        if component.hash_data != hash_data:
+            raise Exception ('Compoent hash does not match the one stored in container header !')
         component.data = bytearray(data)
         component.auth_data = bytearray(auth_data)
-        if component.hash_data != bytearray(hash_data):
-            raise Exception ('Compoent hash does not match the one stored in container header !')
 
         # create the final output file
         data = self.get_data ()
@@ -579,7 +678,7 @@ class CONTAINER ():
 
         return out_file
 
-    def extract (self, name = '', file_path = ''):
+    def extract (self, name = '', file_path = '', jobs = 0):
         if name == '':
             # extract all components inside a container
             # so creat a layout file first
@@ -611,7 +710,7 @@ class CONTAINER ():
                     key_file = 'KEY_ID_CONTAINER_COMP_RSA%s' % match.group(1)
                 else:
                     key_file = ''
-                lz_header = LZ_HEADER.from_buffer(component.data)
+                lz_header = LZ_HEADER.from_buffer_copy(component.data)
                 alg = LZ_HEADER._compress_alg[lz_header.signature]
                 svn = lz_header.svn
                 if component.attribute & COMPONENT_ENTRY._attr['RESERVED']:
@@ -637,32 +736,47 @@ class CONTAINER ():
                     fo.write (line)
             fo.close()
 
+        components = []
         for component in self.header.comp_entry:
             if component.attribute & COMPONENT_ENTRY._attr['RESERVED']:
                 continue
-            # creat individual component region and image binary
             if (component.name.decode() == name) or (name == ''):
-                basename = os.path.join(self.out_dir, '%s' % component.name.decode())
-                sig_file = basename + '.rgn'
-                sig_data = component.data + b'\xff' * get_padding_length (len(component.data)) + component.auth_data
-                gen_file_from_object (sig_file, sig_data)
-
-                bin_file = basename + '.bin'
-                lz_header = LZ_HEADER.from_buffer(component.data)
-                signature = lz_header.signature
-                if signature in [b'LZDM']:
-                    offset = sizeof(lz_header)
-                    data = component.data[offset : offset + lz_header.compressed_len]
-                    gen_file_from_object (bin_file, data)
-                elif signature in [b'LZMA', b'LZ4 ']:
-                    decompress (sig_file, bin_file, self.tool_dir)
-                else:
-                    raise Exception ("Unknown LZ format!")
+                components.append (component)
+        if not components:
+            return
+
+        # each component only writes files named after itself, so they can
+        # be extracted concurrently, the decompression runs in external tools
+        from concurrent.futures import ThreadPoolExecutor
+        workers = max (1, min (len(components), jobs if jobs > 0 else (os.cpu_count() or 1)))
+        with ThreadPoolExecutor (max_workers = workers) as executor:
+            for future in [executor.submit (self.extract_component, component) for component in components]:
+                future.result ()
+
+    def extract_component (self, component):
+        # creat individual component region and image binary
+        basename = os.path.join(self.out_dir, '%s' % component.name.decode())
+        sig_file = basename + '.rgn'
+        sig_data = b''.join ((component.data, b'\xff' * get_padding_length (len(component.data)), component.auth_data))
+        gen_file_from_object (sig_file, sig_data)
+
+        bin_file = basename + '.bin'
+        lz_header = LZ_HEADER.from_buffer_copy(component.data)
+        signature = lz_header.signature
+        if signature in [b'LZDM']:
+            offset = sizeof(lz_header)
+            data = component.data[offset : offset + lz_header.compressed_len]
+            gen_file_from_object (bin_file, data)
+        elif signature in [b'LZMA', b'LZ4 ']:
+            decompress (sig_file, bin_file, self.tool_dir)
+        else:
+            raise Exception ("Unknown LZ format!")
 
-def gen_container_bin (container_list, out_dir, inp_dir, key_dir = '.', tool_dir = ''):
+def gen_container_bin (container_list, out_dir, inp_dir, key_dir = '.', tool_dir = '', comp_level = None):
     for each in container_list:
         container = CONTAINER ()
         container.set_dir_path (out_dir, inp_dir, key_dir, tool_dir)
+        container.comp_level = comp_level
         out_file = container.create (each)
         print ("Container '%s' was created successfully at:  \n  %s" % (container.header.signature.decode(), out_file))
 
@@ -681,6 +795,44 @@ def adjust_auth_type (auth_type_str, key_path):
 
     return auth_type_str
 
+def get_cache_key (comp_file, compress_alg, level, svn, auth_type, key_file, compressor):
+    # identify a compressed and signed component by its input file state and
+    # all the options used to build it, RSA keys are identified the same way,
+    # compressor tells python compression apart from the tools in a tool dir
+    comp_stat = os.stat (comp_file)
+    items = [os.path.abspath (comp_file), comp_stat.st_mtime_ns, comp_stat.st_size, compress_alg, level, svn, auth_type, compressor]
+    if compressor == 'python' and compress_alg == 'Lz4':
+        # a different python lz4 may compress differently
+        lz4 = import_lz4 ()
+        items.extend ([lz4.VERSION, lz4.library_version_string ()])
+    if auth_type.startswith ('RSA'):
+        key_path = get_key_from_store (key_file)
+        key_stat = os.stat (key_path)
+        items.extend ([os.path.abspath (key_path), key_stat.st_mtime_ns, key_stat.st_size])
+    return hashlib.blake2b (repr(items).encode(), digest_size = 16).hexdigest()
+
+def cache_lookup (cache_dir, cache_key):
+    # return (data, hash_data, auth_data) stored for cache_key, or None
+    cache_file = os.path.join (cache_dir, cache_key + '.bin')
+    if not os.path.isfile (cache_file):
+        return None
+    cache_data = get_file_data (cache_file)
+    data_len, hash_len, auth_len = [bytes_to_value (cache_data[i:i + 4]) for i in range (0, 12, 4)]
+    if len(cache_data) != 12 + data_len + hash_len + auth_len:
+        return None
+    offset = 12 + data_len
+    return bytearray (cache_data[12:offset]), bytearray (cache_data[offset:offset + hash_len]), bytearray (cache_data[offset + hash_len:])
+
+def cache_store (cache_dir, cache_key, data, hash_data, auth_data):
+    # write to a temporary file first so that concurrent builds never read a partial entry
+    if not os.path.isdir (cache_dir):
+        os.makedirs (cache_dir, exist_ok = True)
+    cache_file = os.path.join (cache_dir, cache_key + '.bin')
+    temp_file  = '%s.%d.tmp' % (cache_file, os.getpid())
+    gen_file_from_object (temp_file, b''.join ((value_to_bytes (len(data), 4), value_to_bytes (len(hash_data), 4),
+                                                value_to_bytes (len(auth_data), 4), data, hash_data, auth_data)))
+    os.replace (temp_file, cache_file)
+
 def gen_layout (comp_list, img_type, auth_type_str, svn, out_file, key_dir, key_file):
     hash_type = CONTAINER._auth_to_hashalg_str[auth_type_str] if auth_type_str else ''
     auth_type = auth_type_str
@@ -746,7 +898,13 @@ def create_container (args):
         if not key_file:
             raise Exception ("key_path expects a key file path !")
         layout = gen_layout (args.comp_list, args.img_type, args.auth, args.svn, out_file, key_dir, key_file)
-    container_list = eval ('[[%s]]' % layout.replace('\\', '/'))
+    import ast
+    container_list = ast.literal_eval ('[[%s]]' % layout.replace('\\', '/'))
+
+    # the compression level only applies to Lz4 components, '-cl' layouts are all Dummy
+    if args.comp_level is not None:
+        if not any (comp[2] == 'Lz4' for container in container_list for comp in container[1:]):
+            raise Exception ("Compression level is only supported for layouts with 'Lz4' components !")
 
     comp_dir = os.path.abspath(args.comp_dir)
     if not os.path.isdir(comp_dir):
@@ -767,14 +925,14 @@ def create_container (args):
         hdr_entry[3] = args.auth
         container_list[0][0] = tuple(hdr_entry)
 
-    gen_container_bin (container_list, out_dir, comp_dir, key_dir, tool_dir)
+    gen_container_bin (container_list, out_dir, comp_dir, key_dir, tool_dir, args.comp_level)
 
 def extract_container (args):
     tool_dir = args.tool_dir if args.tool_dir else '.'
     data = get_file_data (args.image)
     container = CONTAINER (data)
     container.set_dir_path (args.out_dir, '.', '.', tool_dir)
-    container.extract (args.comp_name, args.image)
+    container.extract (args.comp_name, args.image, args.jobs)
     print ("Components were extraced successfully at:\n  %s" % args.out_dir)
 
 def replace_component (args):
@@ -785,40 +943,74 @@ def replace_component (args):
     out_dir  = os.path.dirname(out_path)
     out_file = os.path.basename(out_path)
     container.set_dir_path (out_dir, '.', '.', tool_dir)
+    container.comp_level = args.comp_level
+    container.cache_dir  = args.cache_dir
     file = container.replace (args.comp_name, args.comp_file, args.compress, args.key_file, args.svn, out_file)
     print ("Component '%s' was replaced successfully at:\n  %s" % (args.comp_name, file))
 
 def sign_component (args):
-    compress_alg = args.compress
-    compress_alg = compress_alg[0].upper() + compress_alg[1:]
+    compress_alg = CONTAINER._compress_alg_str[args.compress]
 
     #extract out dir and file
     sign_file = os.path.abspath(args.out_file)
     out_dir   = os.path.dirname(sign_file)
 
-    lz_file = compress (args.comp_file, compress_alg, args.svn, out_dir, args.tool_dir)
-    data = bytearray(get_file_data (lz_file))
-    hash_data, auth_data = CONTAINER.calculate_auth_data (lz_file, args.auth, args.key_file, out_dir)
-
-    data.extend (b'\xff' * get_padding_length(len(data)))
-    data.extend (auth_data)
-    gen_file_from_object (sign_file, data)
+    # compress in process unless the tools are requested or python lz4 is missing
+    in_process = not args.legacy_tools and compress_alg in ['Dummy', 'Lz4']
+    if in_process and compress_alg == 'Lz4':
+        try:
+            import_lz4 ()
+        except ImportError:
+            in_process = False
+
+    data = None
+    cache_key = None
+    if args.cache_dir:
+        compressor = 'python' if in_process else 'tool:%s' % os.path.abspath (args.tool_dir)
+        cache_key = get_cache_key (args.comp_file, compress_alg, args.comp_level, args.svn, args.auth, args.key_file, compressor)
+        cached = cache_lookup (args.cache_dir, cache_key)
+        if cached:
+            data, hash_data, auth_data = cached
+
+    if data is None:
+        if in_process:
+            # lz_file only names the intermediate signing files
+            lz_file = os.path.join(out_dir, os.path.splitext(os.path.basename (args.comp_file))[0] + '.lz')
+            data = compress_buffer (get_file_data (args.comp_file), compress_alg, args.svn, args.comp_level)
+        else:
+            lz_file = compress (args.comp_file, compress_alg, args.svn, out_dir, args.tool_dir, args.comp_level)
+            data = get_file_bytearray (lz_file)
+        hash_data, auth_data = CONTAINER.calculate_auth_data (lz_file, args.auth, args.key_file, out_dir, data)
+        if cache_key:
+            cache_store (args.cache_dir, cache_key, data, hash_data, auth_data)
+
+    # write the padding and auth data after the component data in turn
+    # rather than growing data to hold all of them first
+    with open (sign_file, 'wb') as fo:
+        fo.write (data)
+        fo.write (b'\xff' * get_padding_length(len(data)))
+        fo.write (auth_data)
     print ("Component file was signed successfully at:\n  %s" % sign_file)
 
 def display_container (args):
-    data = get_file_data (args.image)
-    container = CONTAINER (data)
-    container.dump ()
-
-def main():
-    parser = argparse.ArgumentParser()
-    sub_parser = parser.add_subparsers(help='command')
-
+    # map the image instead of reading it, the header structures are copied
+    # out of the mapping while the component data are only viewed in place
+    with open (args.image, 'rb') as fd:
+        with mmap.mmap (fd.fileno(), 0, access = mmap.ACCESS_READ) as data:
+            container = CONTAINER (data, False)
+            try:
+                container.dump ()
+            finally:
+                # the mapping can only be closed once no view refers to it
+                container.release_data ()
+
+def add_view_parser (sub_parser):
     # Command for display
     cmd_display = sub_parser.add_parser('view', help='display a container image')
     cmd_display.add_argument('-i', dest='image',  type=str, required=True, help='Container input image')
     cmd_display.set_defaults(func=display_container)
 
+def add_create_parser (sub_parser):
     # Command for create
     cmd_display = sub_parser.add_parser('create', help='create a container image')
     group = cmd_display.add_mutually_exclusive_group (required=True)
@@ -834,40 +1026,72 @@ def main():
     cmd_display.add_argument('-cd', dest='comp_dir', type=str, default='', help='Componet image input directory')
     cmd_display.add_argument('-td', dest='tool_dir', type=str, default='', help='Compression tool directory')
     cmd_display.add_argument('-s', dest='svn', type=int, default=0, help='Security version number for Container header')
+    cmd_display.add_argument('-lv', dest='comp_level', type=int, choices=range(1, 13), metavar='LEVEL', help='LZ4 HC compression level 1-12, default 9. Higher levels are smaller but slower to compress, decompression speed is the same')
     cmd_display.set_defaults(func=create_container)
 
+def add_extract_parser (sub_parser):
     # Command for extract
     cmd_display = sub_parser.add_parser('extract', help='extract a component image')
     cmd_display.add_argument('-i',  dest='image',  type=str, required=True, help='Container input image path')
     cmd_display.add_argument('-n',  dest='comp_name',  type=str, default='', help='Component name to extract')
     cmd_display.add_argument('-od', dest='out_dir',  type=str, default='.', help='Output directory')
     cmd_display.add_argument('-td', dest='tool_dir', type=str, default='', help='Compression tool directory')
+    cmd_display.add_argument('-j',  dest='jobs', type=int, default=0, help='Number of components to extract concurrently, default is the CPU count')
     cmd_display.set_defaults(func=extract_container)
 
+def add_replace_parser (sub_parser):
     # Command for replace
     cmd_display = sub_parser.add_parser('replace', help='replace a component image')
     cmd_display.add_argument('-i',  dest='image',  type=str, required=True, help='Container input image path')
     cmd_display.add_argument('-o',  dest='out_image',  type=str, default='', help='Container new output image path')
     cmd_display.add_argument('-n',  dest='comp_name',  type=str, required=True, help='Component name to replace')
     cmd_display.add_argument('-f',  dest='comp_file',  type=str, required=True, help='Component input file path')
-    cmd_display.add_argument('-c',  dest='compress', choices=['lz4', 'lzma', 'dummy'], default='dummy', help='compression algorithm')
+    cmd_display.add_argument('-c',  dest='compress', choices=CONTAINER._compress_alg_str, default='dummy', help='compression algorithm')
     cmd_display.add_argument('-k',  dest='key_file',  type=str, default='', help='Key Id or Private key file path to sign component')
     cmd_display.add_argument('-td', dest='tool_dir', type=str, default='', help='Compression tool directory')
     cmd_display.add_argument('-s', dest='svn', type=int,  default=0, help='Security version number for Component')
+    cmd_display.add_argument('-lv', dest='comp_level', type=int, choices=range(1, 13), metavar='LEVEL', help='LZ4 HC compression level 1-12, default 9. Higher levels are smaller but slower to compress, decompression speed is the same')
+    cmd_display.add_argument('-cc', dest='cache_dir', type=str, default='', help='Cache directory to reuse components compressed and signed from the same inputs')
     cmd_display.set_defaults(func=replace_component)
 
+def add_sign_parser (sub_parser):
     # Command for sign
     cmd_display = sub_parser.add_parser('sign', help='compress and sign a component image')
     cmd_display.add_argument('-f',  dest='comp_file',  type=str, required=True, help='Component input file path')
     cmd_display.add_argument('-o',  dest='out_file',  type=str, default='', help='Signed output image path')
-    cmd_display.add_argument('-c',  dest='compress', choices=['lz4', 'lzma', 'dummy'],  default='dummy', help='compression algorithm')
-    cmd_display.add_argument('-a',  dest='auth', choices=['SHA2_256', 'SHA2_384', 'RSA2048_PKCS1_SHA2_256',
-                'RSA3072_PKCS1_SHA2_384', 'RSA2048_PSS_SHA2_256', 'RSA3072_PSS_SHA2_384', 'NONE'], default='NONE',  help='authentication algorithm')
+    cmd_display.add_argument('-c',  dest='compress', choices=CONTAINER._compress_alg_str,  default='dummy', help='compression algorithm')
+    cmd_display.add_argument('-a',  dest='auth', type=str.upper, choices=['SHA2_256', 'SHA2_384', 'RSA2048_PKCS1_SHA2_256',
+                'RSA3072_PKCS1_SHA2_384', 'RSA2048_PSS_SHA2_256', 'RSA3072_PSS_SHA2_384', 'NONE'], default='NONE',  help='authentication algorithm, case insensitive')
     cmd_display.add_argument('-k',  dest='key_file',  type=str, default='', help='Key Id or Private key file path to sign component')
     cmd_display.add_argument('-td', dest='tool_dir', type=str, default='',  help='Compression tool directory')
     cmd_display.add_argument('-s', dest='svn', type=int,  default=0, help='Security version number for Component')
+    cmd_display.add_argument('-lv', dest='comp_level', type=int, choices=range(1, 13), metavar='LEVEL', help='LZ4 HC compression level 1-12, default 9. Higher levels are smaller but slower to compress, decompression speed is the same')
+    cmd_display.add_argument('-lt', dest='legacy_tools', action='store_true', help='Always compress with the external tools from the tool directory')
+    cmd_display.add_argument('-cc', dest='cache_dir', type=str, default='', help='Cache directory to reuse components compressed and signed from the same inputs')
     cmd_display.set_defaults(func=sign_component)
 
+# Sub-command parser builders, in the order they are listed in the help
+sub_parser_builders = {
+    'view'    : add_view_parser,
+    'create'  : add_create_parser,
+    'extract' : add_extract_parser,
+    'replace' : add_replace_parser,
+    'sign'    : add_sign_parser,
+}
+
+def main():
+    parser = argparse.ArgumentParser()
+    sub_parser = parser.add_subparsers(help='command')
+
+    # Only build the parser for the requested sub-command, all of them
+    # for help, usage errors or an unknown command
+    cmd = sys.argv[1] if len(sys.argv) > 1 else None
+    if cmd in sub_parser_builders:
+        sub_parser_builders[cmd] (sub_parser)
+    else:
+        for add_parser in sub_parser_builders.values():
+            add_parser (sub_parser)
+
     # Parse arguments and run sub-command
     args = parser.parse_args()
     try:
@@ -879,6 +1103,12 @@ def main():
     if args.func == sign_component:
         if args.auth.startswith('RSA') and args.key_file == '':
             parser.error("the following arguments are required: -k")
+    if args.func in [sign_component, replace_component]:
+        if args.comp_level is not None and args.compress != 'lz4':
+            parser.error("argument -lv: only supported with '-c lz4'")
+    if args.func == sign_component:
+        if args.comp_level is not None and args.legacy_tools:
+            parser.error("argument -lv: not allowed with argument -lt")
 
     func(args)
 
@@ -17,6 +17,8 @@ import shutil
 import subprocess
 import struct
 import hashlib
+import mmap
+import functools
 import string
 
 SIGNING_KEY = {
@@ -176,6 +178,16 @@ def get_key_from_store (in_key):
 
     return priv_key
 
+def get_file_digest (file, hash_alg):
+    # hash a file without loading the whole content into memory, the mapped
+    # file is hashed in a single update call so OpenSSL runs over it in one go
+    with open (file, 'rb') as fd:
+        hash_obj = hashlib.new (hash_alg)
+        if os.fstat (fd.fileno()).st_size > 0:
+            with mmap.mmap (fd.fileno(), 0, access = mmap.ACCESS_READ) as mm:
+                hash_obj.update (mm)
+        return hash_obj.digest()
+
 #
 # Sign an file using openssl
 #
@@ -184,9 +196,10 @@ def get_key_from_store (in_key):
 # sign_scheme[Input]        Sign/padding scheme
 # in_file    [Input]        Input file to be signed
 # out_file   [Input/Output] Signed data file
+# digest     [Input]        Optional hash of the in_file content if already known
 #
 
-def single_sign_file (priv_key, hash_type, sign_scheme, in_file, out_file):
+def single_sign_file (priv_key, hash_type, sign_scheme, in_file, out_file, digest = None):
 
     _hash_type_string = {
         "SHA2_256"    : 'sha256',
@@ -194,14 +207,6 @@ def single_sign_file (priv_key, hash_type, sign_scheme, in_file, out_file):
         "SHA2_512"    : 'sha512',
     }
 
-    _hash_digest_Size = {
-        # Hash_string : Hash_Size
-        "SHA2_256"    : 32,
-        "SHA2_384"    : 48,
-        "SHA2_512"    : 64,
-        "SM3_256"     : 32,
-    }
-
     _sign_scheme_string = {
         "RSA_PKCS1"    : 'pkcs1',
         "RSA_PSS"      : 'pss',
@@ -209,29 +214,14 @@ def single_sign_file (priv_key, hash_type, sign_scheme, in_file, out_file):
 
     priv_key = get_key_from_store(priv_key)
 
-    # Temporary files to store hash generated
-    hash_file_tmp = out_file+'.hash.tmp'
+    # Temporary file to store hash generated
     hash_file     = out_file+'.hash'
 
-    # Generate hash using openssl dgst in hex format
-    cmdargs = [get_openssl_path(), 'dgst', '-'+'%s' % _hash_type_string[hash_type], '-out', '%s' % hash_file_tmp, '%s' % in_file]
-    run_process (cmdargs)
-
-    # Extract hash form dgst command output and convert to ascii
-    with open(hash_file_tmp, 'r') as fin:
-        hashdata = fin.read()
-    fin.close()
-
-    try:
-        hashdata = hashdata.rsplit('=', 1)[1].strip()
-    except:
-        raise Exception('Hash Data not found for signing!')
-
-    if len(hashdata) != (_hash_digest_Size[hash_type] * 2):
-        raise Exception('Hash Data size do match with for hash type!')
-
-    hashdata_bytes = bytearray.fromhex(hashdata)
-    open (hash_file, 'wb').write(hashdata_bytes)
+    # Generate hash in process rather than spawning openssl dgst for it
+    if digest is None:
+        digest = get_file_digest (in_file, _hash_type_string[hash_type])
+    with open (hash_file, 'wb') as fd:
+        fd.write (digest)
 
     print ("Key used for Singing %s !!" % priv_key)
 
@@ -244,6 +234,25 @@ def single_sign_file (priv_key, hash_type, sign_scheme, in_file, out_file):
 
     return
 
+@functools.lru_cache (maxsize = 8)
+def get_pub_key_text (in_key, mtime, size):
+    # run openssl only once per key file, the file mtime and size are part
+    # of the cache key so that a changed key file is parsed again
+    is_prv_key = False
+    cmdline = [get_openssl_path(), 'rsa', '-pubout', '-text', '-noout', '-in', '%s' % in_key]
+    # Check if it is public key or private key
+    with open(in_key, 'r') as fd:
+        text = fd.read()
+    if '-BEGIN RSA PRIVATE KEY-' in text or '-BEGIN PRIVATE KEY-' in text:
+        is_prv_key = True
+    elif '-BEGIN PUBLIC KEY-' in text:
+        cmdline.extend (['-pubin'])
+    else:
+        raise Exception('Unknown key format "%s" !' % in_key)
+
+    output = run_process (cmdline, capture_out = True)
+    return is_prv_key, output
+
 #
 # Extract public key using openssl
 #
@@ -258,26 +267,13 @@ def single_sign_gen_pub_key (in_key, pub_key_file = None):
     in_key = get_key_from_store(in_key)
 
     # Expect key to be in PEM format
-    is_prv_key = False
-    cmdline = [get_openssl_path(), 'rsa', '-pubout', '-text', '-noout', '-in', '%s' % in_key]
-    # Check if it is public key or private key
-    text = open(in_key, 'r').read()
-    if '-BEGIN RSA PRIVATE KEY-' in text or '-BEGIN PRIVATE KEY-' in text:
-        is_prv_key = True
-    elif '-BEGIN PUBLIC KEY-' in text:
-        cmdline.extend (['-pubin'])
-    else:
-        raise Exception('Unknown key format "%s" !' % in_key)
+    key_stat = os.stat (in_key)
+    is_prv_key, output = get_pub_key_text (in_key, key_stat.st_mtime_ns, key_stat.st_size)
 
     if pub_key_file:
-        cmdline.extend (['-out', '%s' % pub_key_file])
-        capture = False
-    else:
-        capture = True
+        with open(pub_key_file, 'w') as fd:
+            fd.write (output)
 
-    output = run_process (cmdline, capture_out = capture)
-    if not capture:
-        output = text = open(pub_key_file, 'r').read()
     data     = output.replace('\r', '')
     data     = data.replace('\n', '')
     data     = data.replace('  ', '')